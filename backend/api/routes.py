@@ -1,37 +1,54 @@
 """
 API routes for the RAG chatbot
 """
-from fastapi import APIRouter, Form, UploadFile, File, HTTPException
+from fastapi import APIRouter, Depends, Form, Request, UploadFile, File, HTTPException
 from fastapi.responses import JSONResponse
 from pathlib import Path
 import logging
+import time
 
 from ..models.schemas import (
     ChatRequest, ChatResponse, UploadResponse, 
     SessionInfo, HealthResponse
 )
-from ..services.vector_service import vector_service
-from ..services.chat_service import chat_service
+from ..services.vector_service import VectorStoreService, get_vector_service
+from ..services.chat_service import ChatService, get_chat_service
 from ..utils.helpers import (
-    validate_session_id, validate_pdf_upload, 
-    save_upload_file, cleanup_temp_file
+    TempFilePool, validate_session_id, validate_and_save
 )
 from ..config import settings
 
+
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Cached health verdict so polling monitors don't hammer Ollama
+_last_health = {"ts": 0.0, "ok": False, "error": ""}
+
+# Recycled scratch paths for PDF uploads; avoids per-upload file
+# creation and deletion churn
+_upload_pool = TempFilePool(settings.TEMP_UPLOAD_DIR)
+
+
 
 @router.get("/health", response_model=HealthResponse)
-async def health_check():
+async def health_check(
+    vector_service: VectorStoreService = Depends(get_vector_service)
+):
     """
     Check if the API and dependencies are working
     """
-    try:
-        # Test Ollama connection
-        test_embed = vector_service.embeddings.embed_query("test")
-        
+    # Re-probe Ollama only after the cached verdict expires
+    if time.time() - _last_health["ts"] > settings.HEALTH_CHECK_TTL_SECONDS:
+        try:
+            vector_service.embeddings.embed_query("test")
+            _last_health.update(ts=time.time(), ok=True, error="")
+        except Exception as e:
+            logger.error(f"Health check failed: {str(e)}")
+            _last_health.update(ts=time.time(), ok=False, error=str(e))
+
+    if _last_health["ok"]:
         return HealthResponse(
             status="healthy",
             ollama_status="connected",
@@ -39,22 +56,24 @@ async def health_check():
             llm_model=settings.LLM_MODEL,
             active_sessions=vector_service.get_active_sessions()
         )
-    except Exception as e:
-        logger.error(f"Health check failed: {str(e)}")
-        return JSONResponse(
-            status_code=503,
-            content={
-                "status": "unhealthy",
-                "error": str(e),
-                "note": f"Make sure Ollama is running with 'ollama pull {settings.EMBEDDING_MODEL}'"
-            }
-        )
+
+    return JSONResponse(
+        status_code=503,
+        content={
+            "status": "unhealthy",
+            "error": _last_health["error"],
+            "note": f"Make sure Ollama is running with 'ollama pull {settings.EMBEDDING_MODEL}'"
+        }
+    )
 
 
 @router.post("/upload", response_model=UploadResponse)
 async def upload_pdf(
+    request: Request,
     file: UploadFile = File(..., description="PDF file to upload"),
-    session_id: str = Form(..., description="Session identifier")
+    session_id: str = Form(..., description="Session identifier"),
+    vector_service: VectorStoreService = Depends(get_vector_service),
+    chat_service: ChatService = Depends(get_chat_service)
 ):
     """
     Upload and process a PDF file for RAG
@@ -68,15 +87,12 @@ async def upload_pdf(
             detail="Invalid session ID format. Must start with 'session_' or 'portfolio_'"
         )
     
-    # Validate PDF file
-    await validate_pdf_upload(file, settings.MAX_FILE_SIZE)
-    
-    # Save uploaded PDF temporarily
-    file_location = settings.TEMP_UPLOAD_DIR / file.filename
+    # Validate and save in one streaming pass over a recycled
+    # scratch path
+    file_location = _upload_pool.acquire()
     
     try:
-        # Save file
-        await save_upload_file(file, file_location)
+        await validate_and_save(file, file_location, settings.MAX_FILE_SIZE, request)
         logger.info(f"💾 Saved PDF temporarily: {file_location}")
         
         # Process PDF and create vectorstore
@@ -85,6 +101,10 @@ async def upload_pdf(
             session_id
         )
         
+        # The session now answers about a new document: cached answers
+        # for the old one must not survive the upload
+        chat_service.semantic_cache.invalidate(session_id)
+        
         logger.info(f"✅ Successfully processed PDF for session {session_id}")
         
         return UploadResponse(
@@ -95,6 +115,9 @@ async def upload_pdf(
             session_id=session_id
         )
         
+    except HTTPException:
+        raise
+    
     except Exception as e:
         logger.error(f"❌ Error processing PDF: {str(e)}")
         raise HTTPException(
@@ -103,12 +126,16 @@ async def upload_pdf(
         )
     
     finally:
-        # Cleanup temporary file
-        cleanup_temp_file(str(file_location))
+        # Return the scratch path to the pool
+        _upload_pool.release(file_location)
 
 
 @router.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
+async def chat(
+    request: ChatRequest,
+    vector_service: VectorStoreService = Depends(get_vector_service),
+    chat_service: ChatService = Depends(get_chat_service)
+):
     """
     Chat endpoint with RAG and conversation history
     """
@@ -142,7 +169,11 @@ async def chat(request: ChatRequest):
 
 
 @router.get("/sessions/{session_id}/info", response_model=SessionInfo)
-async def get_session_info(session_id: str):
+async def get_session_info(
+    session_id: str,
+    vector_service: VectorStoreService = Depends(get_vector_service),
+    chat_service: ChatService = Depends(get_chat_service)
+):
     """
     Get information about a session
     """
@@ -158,7 +189,11 @@ async def get_session_info(session_id: str):
 
 
 @router.delete("/sessions/{session_id}")
-async def delete_session(session_id: str):
+async def delete_session(
+    session_id: str,
+    vector_service: VectorStoreService = Depends(get_vector_service),
+    chat_service: ChatService = Depends(get_chat_service)
+):
     """
     Delete a session and its data
     """
@@ -180,7 +215,10 @@ async def delete_session(session_id: str):
 
 
 @router.post("/sessions/{session_id}/clear-history")
-async def clear_session_history(session_id: str):
+async def clear_session_history(
+    session_id: str,
+    chat_service: ChatService = Depends(get_chat_service)
+):
     """
     Clear chat history for a session (keeps vectorstore)
     """
@@ -193,20 +231,20 @@ async def clear_session_history(session_id: str):
 
 
 @router.get("/sessions")
-async def list_sessions():
+async def list_sessions(
+    vector_service: VectorStoreService = Depends(get_vector_service),
+    chat_service: ChatService = Depends(get_chat_service)
+):
     """
     List all active sessions
     """
-    import os
-    sessions = []
-    
-    if settings.VECTORS_DIR.exists():
-        for session_dir in settings.VECTORS_DIR.iterdir():
-            if session_dir.is_dir():
-                sessions.append({
-                    "session_id": session_dir.name,
-                    "has_vectorstore": True,
-                    "message_count": chat_service.get_message_count(session_dir.name)
-                })
+    sessions = [
+        {
+            "session_id": session_id,
+            "has_vectorstore": True,
+            "message_count": chat_service.get_message_count(session_id)
+        }
+        for session_id in vector_service.list_session_ids()
+    ]
     
     return {"sessions": sessions, "count": len(sessions)}
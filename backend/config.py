@@ -19,9 +19,19 @@ class Settings(BaseSettings):
     APP_VERSION: str = "2.0"
     HOST: str = "127.0.0.1"
     PORT: int = 8050
+    # Session caches are per-process; raising this needs sticky
+    # sessions in front of the app
+    WORKERS: int = 1
+    HEALTH_CHECK_TTL_SECONDS: int = 10
     
     # CORS
-    CORS_ORIGINS: list = ["*"]
+    # Explicit origins: wildcard plus credentials is rejected by
+    # browsers and defeats preflight caching
+    CORS_ORIGINS: list = [
+        "http://127.0.0.1:8050",
+        "http://localhost:8050",
+    ]
+    CORS_MAX_AGE: int = 86400
     
     # API Keys
     GROQ_API_KEY: str = os.getenv("GROQ_API_KEY", "")
@@ -35,10 +45,38 @@ class Settings(BaseSettings):
     EMBEDDING_MODEL: str = "nomic-embed-text"
     OLLAMA_BASE_URL: str = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
     
+    # PDF Processing
+    PDF_PARALLEL_WORKERS: int = os.cpu_count() or 1
+
     # RAG Configuration
     CHUNK_SIZE: int = 1000
     CHUNK_OVERLAP: int = 200
     RETRIEVAL_K: int = 4
+    INDEX_TYPE: str = "flat"  # one of: flat, hnsw, sq8, ivfpq
+    IVF_NPROBE: int = 8
+    FAISS_MMAP: bool = True
+
+    # Session Cache Configuration
+    MAX_CACHED_SESSIONS: int = int(os.getenv("MAX_CACHED_SESSIONS", "64"))
+    SESSION_TTL_HOURS: float = float(os.getenv("SESSION_TTL_HOURS", "12"))
+    MAX_CACHE_MEMORY_MB: int = 512
+    CACHE_SWEEP_INTERVAL_SECONDS: int = 60
+
+    # Embedding Configuration
+    EMBED_BATCH_SIZE: int = 32
+    EMBED_CONCURRENCY: int = 4
+
+    # Embedding Cache Configuration
+    EMBED_CACHE_SIZE: int = 2048
+    EMBED_CACHE_TTL_SECONDS: int = 3600
+
+    # Conversation Memory
+    MEMORY_WINDOW: int = 20
+
+    # Semantic Cache Configuration
+    SEMANTIC_CACHE_THRESHOLD: float = 0.95
+    SEMANTIC_CACHE_MAX_SIZE: int = 256
+    SEMANTIC_CACHE_TTL_SECONDS: int = 3600
     
     # File Storage
     TEMP_UPLOAD_DIR: Path = Path("temp_uploads")
@@ -1,11 +1,13 @@
 """
 Main FastAPI application for RAG Chatbot
 """
+import asyncio
 import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, ORJSONResponse
 from pathlib import Path
 
 from .config import settings
@@ -18,13 +20,66 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+
+async def _sweep_session_caches():
+    """Periodically evict expired session cache entries"""
+    from backend.services.vector_service import get_vector_service
+    from backend.services.chat_service import get_chat_service
+
+    while True:
+        await asyncio.sleep(settings.CACHE_SWEEP_INTERVAL_SECONDS)
+        try:
+            get_vector_service().vectorstore_cache.sweep()
+            chat_service = get_chat_service()
+            chat_service.session_store.sweep()
+            chat_service.semantic_cache.sweep()
+        except Exception as e:
+            logger.warning(f"Session cache sweep failed: {e}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Initialize services once per process and clean up on shutdown"""
+    logger.info("=" * 60)
+    logger.info("🚀 RAG Chatbot API Starting...")
+    logger.info("=" * 60)
+    logger.info(f"📁 Temp uploads: {settings.TEMP_UPLOAD_DIR}")
+    logger.info(f"💾 Vectors storage: {settings.VECTORS_DIR}")
+    logger.info(f"🔗 Ollama URL: {settings.OLLAMA_BASE_URL}")
+    logger.info(f"🤖 Embedding model: {settings.EMBEDDING_MODEL}")
+    logger.info(f"💡 LLM model: {settings.LLM_MODEL}")
+    logger.info("=" * 60)
+
+    # Build the singletons and warm up the Ollama connection exactly once
+    try:
+        from backend.services.vector_service import get_vector_service
+        await asyncio.to_thread(
+            get_vector_service().embeddings.embed_query, "warmup"
+        )
+        logger.info("✅ Ollama connection successful!")
+    except Exception as e:
+        logger.warning(f"⚠️  Warning: Could not connect to Ollama: {e}")
+        logger.warning("   Make sure Ollama is running: 'ollama serve'")
+        logger.warning(f"   And pull the model: 'ollama pull {settings.EMBEDDING_MODEL}'")
+
+    # Sweep expired session caches in the background
+    sweeper = asyncio.create_task(_sweep_session_caches())
+
+    yield
+
+    sweeper.cancel()
+    logger.info("🛑 RAG Chatbot API shutting down...")
+
+
 # Create FastAPI app
 app = FastAPI(
     title=settings.APP_TITLE,
     description=settings.APP_DESCRIPTION,
     version=settings.APP_VERSION,
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
 # Enable CORS
@@ -34,6 +89,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    max_age=settings.CORS_MAX_AGE,
 )
 
 # Include API routes
@@ -54,36 +110,6 @@ async def serve_frontend():
     return FileResponse(html_file)
 
 
-@app.on_event("startup")
-async def startup_event():
-    """Run on application startup"""
-    logger.info("=" * 60)
-    logger.info("🚀 RAG Chatbot API Starting...")
-    logger.info("=" * 60)
-    logger.info(f"📁 Temp uploads: {settings.TEMP_UPLOAD_DIR}")
-    logger.info(f"💾 Vectors storage: {settings.VECTORS_DIR}")
-    logger.info(f"🔗 Ollama URL: {settings.OLLAMA_BASE_URL}")
-    logger.info(f"🤖 Embedding model: {settings.EMBEDDING_MODEL}")
-    logger.info(f"💡 LLM model: {settings.LLM_MODEL}")
-    logger.info("=" * 60)
-    
-    # Test Ollama connection
-    try:
-        from backend.services.vector_service import vector_service
-        test = vector_service.embeddings.embed_query("test")
-        logger.info("✅ Ollama connection successful!")
-    except Exception as e:
-        logger.warning(f"⚠️  Warning: Could not connect to Ollama: {e}")
-        logger.warning("   Make sure Ollama is running: 'ollama serve'")
-        logger.warning(f"   And pull the model: 'ollama pull {settings.EMBEDDING_MODEL}'")
-
-
-@app.on_event("shutdown")
-async def shutdown_event():
-    """Run on application shutdown"""
-    logger.info("🛑 RAG Chatbot API shutting down...")
-
-
 if __name__ == "__main__":
     import uvicorn
     logger.info(f"\n🎯 Starting server on http://{settings.HOST}:{settings.PORT}")
@@ -100,10 +126,16 @@ if __name__ == "__main__":
             reload=True
         )
     else:
-        # Running as: python main.py
+        # Running as: python main.py (production)
+        # NOTE: session caches live in-process, so WORKERS > 1 needs
+        # sticky sessions at the load balancer (or a shared store) for
+        # cached sessions to hit; single worker is the safe default.
         uvicorn.run(
-            app,
+            "backend.main:app",
             host=settings.HOST,
             port=settings.PORT,
+            workers=settings.WORKERS,
+            loop="auto",
+            http="httptools",
             reload=False
         )
@@ -1,22 +1,172 @@
 """
 Chat service for RAG-based conversations
 """
-from typing import Dict, List, Tuple
+import asyncio
+import hashlib
+import re
+import time
+from functools import lru_cache
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
 import logging
 
-from langchain.chains import create_history_aware_retriever, create_retrieval_chain
+import numpy as np
+
 from langchain.chains.combine_documents import create_stuff_documents_chain
 from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import SystemMessage
 from langchain_community.chat_message_histories import ChatMessageHistory
+from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_core.runnables.history import RunnableWithMessageHistory
 from langchain_groq import ChatGroq
 
 from backend.config import settings
-from backend.services.vector_service import vector_service
+from backend.services.vector_service import get_vector_service
+from backend.utils.cache import BoundedSessionCache
 
 logger = logging.getLogger(__name__)
 
+# Referential words that suggest the prompt leans on earlier turns
+_ANAPHORA_RE = re.compile(
+    r'\b(it|that|this|these|those|they|them|he|she|his|her|above|previous)\b',
+    re.IGNORECASE
+)
+
+
+class SemanticCache:
+    """Per-session similarity cache of previously answered prompts
+
+    Near-duplicate questions are answered from the cache instead of
+    re-running the full RAG pipeline. Entries are evicted LRU-style
+    once the per-session cache is full, and expire after a TTL.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: int, threshold: float,
+                 max_sessions: int = 64):
+        """
+        Initialize the semantic cache
+
+        Args:
+            max_size: Maximum entries per session
+            ttl_seconds: Time-to-live for entries in seconds
+            threshold: Minimum cosine similarity for a cache hit
+            max_sessions: Maximum number of sessions held at once
+        """
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.threshold = threshold
+        self.max_sessions = max_sessions
+        # session_id -> OrderedDict[prompt_hash -> entry dict],
+        # LRU-ordered by session so the whole dict stays bounded
+        self._sessions: OrderedDict = OrderedDict()
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        """Convert an embedding to a unit-norm float32 vector"""
+        vec = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        if norm > 0:
+            vec = vec / norm
+        return vec
+
+    def _prune_expired(self, entries: OrderedDict) -> None:
+        """Drop entries older than the TTL"""
+        now = time.time()
+        expired = [key for key, entry in entries.items()
+                   if now - entry["timestamp"] > self.ttl_seconds]
+        for key in expired:
+            del entries[key]
+
+    def lookup(self, session_id: str, query_embedding: np.ndarray) -> Optional[Tuple[str, List[str]]]:
+        """
+        Look up a cached answer for a semantically similar prompt
+
+        Args:
+            session_id: Session identifier
+            query_embedding: Normalized embedding of the prompt
+
+        Returns:
+            Optional[Tuple[str, List[str]]]: Cached answer and sources, or None
+        """
+        entries = self._sessions.get(session_id)
+        if not entries:
+            return None
+
+        self._prune_expired(entries)
+        if not entries:
+            return None
+
+        keys = list(entries.keys())
+        cache_matrix = np.stack([entries[key]["embedding"] for key in keys])
+        similarities = cache_matrix @ query_embedding
+        best_idx = int(np.argmax(similarities))
+
+        if similarities[best_idx] < self.threshold:
+            return None
+
+        best_key = keys[best_idx]
+        entries.move_to_end(best_key)
+        self._sessions.move_to_end(session_id)
+        entry = entries[best_key]
+        logger.info(
+            f"Semantic cache hit for session {session_id} "
+            f"(similarity: {similarities[best_idx]:.3f})"
+        )
+        return entry["answer"], entry["sources"]
+
+    def store(self, session_id: str, prompt: str, query_embedding: np.ndarray,
+              answer: str, sources: List[str]) -> None:
+        """
+        Store an answered prompt in the cache
+
+        Args:
+            session_id: Session identifier
+            prompt: User's question
+            query_embedding: Normalized embedding of the prompt
+            answer: Generated answer
+            sources: Source documents for the answer
+        """
+        entries = self._sessions.setdefault(session_id, OrderedDict())
+        self._sessions.move_to_end(session_id)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+        key = hashlib.sha256(prompt.encode()).hexdigest()
+        entries[key] = {
+            "embedding": query_embedding,
+            "prompt": prompt,
+            "answer": answer,
+            "sources": sources,
+            "timestamp": time.time(),
+        }
+        entries.move_to_end(key)
+        while len(entries) > self.max_size:
+            entries.popitem(last=False)
+
+    def sweep(self) -> int:
+        """
+        Drop expired entries and empty sessions
+
+        Returns:
+            int: Number of sessions removed
+        """
+        empty = []
+        for session_id, entries in self._sessions.items():
+            self._prune_expired(entries)
+            if not entries:
+                empty.append(session_id)
+        for session_id in empty:
+            del self._sessions[session_id]
+        return len(empty)
+
+    def invalidate(self, session_id: str) -> None:
+        """
+        Drop all cached answers for a session
+
+        Args:
+            session_id: Session identifier
+        """
+        self._sessions.pop(session_id, None)
+
 
 class ChatService:
     """Service for managing chat conversations with RAG"""
@@ -29,8 +179,48 @@ class ChatService:
             temperature=settings.LLM_TEMPERATURE,
             max_tokens=settings.LLM_MAX_TOKENS
         )
-        self.session_store: Dict[str, BaseChatMessageHistory] = {}
-        
+        self.session_store = BoundedSessionCache(
+            max_entries=settings.MAX_CACHED_SESSIONS,
+            ttl_seconds=settings.SESSION_TTL_HOURS * 3600
+        )
+        self.semantic_cache = SemanticCache(
+            max_size=settings.SEMANTIC_CACHE_MAX_SIZE,
+            ttl_seconds=settings.SEMANTIC_CACHE_TTL_SECONDS,
+            threshold=settings.SEMANTIC_CACHE_THRESHOLD,
+            max_sessions=settings.MAX_CACHED_SESSIONS
+        )
+
+        # Static chain pieces built once, reused across requests
+        self._contextualize_prompt = ChatPromptTemplate.from_messages([
+            ("system",
+             "Given a chat history and the latest user question which might reference "
+             "context in the chat history, formulate a standalone question which can be "
+             "understood without the chat history. Do NOT answer the question, just "
+             "reformulate it if needed and otherwise return it as is."),
+            MessagesPlaceholder("chat_history"),
+            ("human", "{input}"),
+        ])
+        qa_prompt = ChatPromptTemplate.from_messages([
+            ("system",
+             "You are a helpful AI assistant. Use the following context from the uploaded PDF "
+             "to answer the user's question accurately and concisely.\n\n"
+             "Important guidelines:\n"
+             "- If the answer is in the context, provide a clear and detailed response\n"
+             "- If you're unsure or the information isn't in the context, say so honestly\n"
+             "- Use bullet points or numbered lists when appropriate for clarity\n"
+             "- Cite specific sections when relevant\n\n"
+             "Context:\n{context}"),
+            MessagesPlaceholder("chat_history"),
+            ("human", "{input}"),
+        ])
+        self._document_chain = create_stuff_documents_chain(self.llm, qa_prompt)
+        self._rewrite_chain = self._contextualize_prompt | self.llm | StrOutputParser()
+        # Sessions with a consolidation task in flight; the task dict
+        # holds strong references so asyncio cannot garbage-collect a
+        # running consolidation mid-flight
+        self._active_consolidations: set = set()
+        self._consolidation_tasks: Dict[str, asyncio.Task] = {}
+
         logger.info(f"ChatService initialized with model: {settings.LLM_MODEL}")
     
     def get_session_history(self, session_id: str) -> BaseChatMessageHistory:
@@ -43,10 +233,12 @@ class ChatService:
         Returns:
             BaseChatMessageHistory: Chat history for the session
         """
-        if session_id not in self.session_store:
-            self.session_store[session_id] = ChatMessageHistory()
+        history = self.session_store.get(session_id)
+        if history is None:
+            history = ChatMessageHistory()
+            self.session_store.put(session_id, history)
             logger.info(f"Created new chat history for session {session_id}")
-        return self.session_store[session_id]
+        return history
     
     async def chat(self, prompt: str, session_id: str) -> Tuple[str, List[str]]:
         """
@@ -64,77 +256,84 @@ class ChatService:
             Exception: If chat processing fails
         """
         try:
-            # Get vectorstore
-            vectorstore = vector_service.get_vectorstore(session_id)
-            
-            # Create retriever
-            retriever = vectorstore.as_retriever(
-                search_type="similarity",
-                search_kwargs={"k": settings.RETRIEVAL_K}
-            )
-            
-            # Create context-aware query reformulation
-            contextualize_q_prompt = ChatPromptTemplate.from_messages([
-                ("system", 
-                 "Given a chat history and the latest user question which might reference "
-                 "context in the chat history, formulate a standalone question which can be "
-                 "understood without the chat history. Do NOT answer the question, just "
-                 "reformulate it if needed and otherwise return it as is."),
-                MessagesPlaceholder("chat_history"),
-                ("human", "{input}"),
-            ])
-            
-            history_aware_retriever = create_history_aware_retriever(
-                self.llm, retriever, contextualize_q_prompt
-            )
-            
-            # Create answer generation chain
-            qa_prompt = ChatPromptTemplate.from_messages([
-                ("system",
-                 "You are a helpful AI assistant. Use the following context from the uploaded PDF "
-                 "to answer the user's question accurately and concisely.\n\n"
-                 "Important guidelines:\n"
-                 "- If the answer is in the context, provide a clear and detailed response\n"
-                 "- If you're unsure or the information isn't in the context, say so honestly\n"
-                 "- Use bullet points or numbered lists when appropriate for clarity\n"
-                 "- Cite specific sections when relevant\n\n"
-                 "Context:\n{context}"),
-                MessagesPlaceholder("chat_history"),
-                ("human", "{input}"),
-            ])
-            
-            document_chain = create_stuff_documents_chain(self.llm, qa_prompt)
-            rag_chain = create_retrieval_chain(history_aware_retriever, document_chain)
-            
-            # Combine with conversation memory
-            conversational_rag_chain = RunnableWithMessageHistory(
-                rag_chain,
-                self.get_session_history,
-                input_messages_key="input",
-                history_messages_key="chat_history",
-                output_messages_key="answer"
+            vector_service = get_vector_service()
+
+            # Check the semantic cache before running the full pipeline
+            raw_embedding = await asyncio.to_thread(
+                vector_service.embeddings.embed_query, prompt
             )
-            
+            query_embedding = SemanticCache._normalize(raw_embedding)
+            cached = self.semantic_cache.lookup(session_id, query_embedding)
+            if cached is not None:
+                # Cached turns still belong to the conversation record,
+                # otherwise later anaphora rewrites lose the referent
+                answer, sources = cached
+                history = self.get_session_history(session_id)
+                history.add_user_message(prompt)
+                history.add_ai_message(answer)
+                self._maybe_consolidate(session_id)
+                return answer, sources
+
+            # Get vectorstore for the session
+            vectorstore = await vector_service.get_vectorstore(session_id)
+
             logger.info(f"Processing chat for session {session_id}")
-            
-            # Generate response
-            response = conversational_rag_chain.invoke(
-                {"input": prompt},
-                config={"configurable": {"session_id": session_id}},
-            )
-            
-            answer = response["answer"]
-            
+
+            history = self.get_session_history(session_id)
+            needs_rewrite = bool(history.messages) and _ANAPHORA_RE.search(prompt) is not None
+
+            if needs_rewrite:
+                # Prompt references earlier turns: rewrite it into a
+                # standalone question, then batch-search both variants
+                # in one FAISS call with rank fusion
+                logger.info(f"Using history-aware retrieval for session {session_id}")
+                rewritten = await asyncio.to_thread(
+                    self._rewrite_chain.invoke,
+                    {"input": prompt, "chat_history": list(history.messages)},
+                )
+                context = await vector_service.batch_search(
+                    session_id, [prompt, rewritten]
+                )
+                answer = await asyncio.to_thread(
+                    self._document_chain.invoke,
+                    {"input": prompt, "context": context,
+                     "chat_history": list(history.messages)},
+                )
+                history.add_user_message(prompt)
+                history.add_ai_message(answer)
+            else:
+                # Standalone question: skip the rewrite LLM call and
+                # search with the embedding already computed for the
+                # semantic cache
+                logger.info(f"Skipping query rewrite for session {session_id}")
+                context = await asyncio.to_thread(
+                    vectorstore.similarity_search_by_vector,
+                    raw_embedding, settings.RETRIEVAL_K
+                )
+                answer = await asyncio.to_thread(
+                    self._document_chain.invoke,
+                    {"input": prompt, "context": context,
+                     "chat_history": list(history.messages)},
+                )
+                history.add_user_message(prompt)
+                history.add_ai_message(answer)
+
             # Extract source documents
             sources = []
-            if "context" in response and response["context"]:
+            if context:
                 sources = [
-                    f"Page {doc.metadata.get('page', 'Unknown')}" 
-                    for doc in response["context"][:3]
+                    f"Page {doc.metadata.get('page', 'Unknown')}"
+                    for doc in context[:3]
                 ]
             
+            # Cache the answer for near-duplicate follow-ups
+            self.semantic_cache.store(session_id, prompt, query_embedding, answer, sources)
+
+            # Trim long conversations in the background
+            self._maybe_consolidate(session_id)
+
             logger.info(f"Generated response for session {session_id}")
-            
+
             return answer, sources
             
         except ValueError as e:
@@ -144,6 +343,72 @@ class ChatService:
             logger.error(f"Chat processing failed: {str(e)}")
             raise Exception(f"Failed to generate response: {str(e)}")
     
+    def _maybe_consolidate(self, session_id: str) -> None:
+        """
+        Schedule background history consolidation if the window is exceeded
+
+        Args:
+            session_id: Session identifier
+        """
+        history = self.session_store.get(session_id)
+        if history is None or len(history.messages) <= settings.MEMORY_WINDOW:
+            return
+        if session_id in self._active_consolidations:
+            return
+
+        self._active_consolidations.add(session_id)
+        num_to_summarize = len(history.messages) - settings.MEMORY_WINDOW
+        task = asyncio.create_task(
+            self._consolidate_memory(session_id, num_to_summarize)
+        )
+        self._consolidation_tasks[session_id] = task
+
+        def _on_done(_task: asyncio.Task, session_id: str = session_id) -> None:
+            self._consolidation_tasks.pop(session_id, None)
+            self._active_consolidations.discard(session_id)
+
+        task.add_done_callback(_on_done)
+
+    async def _consolidate_memory(self, session_id: str, num_messages: int) -> None:
+        """
+        Summarize the oldest messages into a single system message
+
+        Keeps per-request prompt size bounded: long conversations are
+        folded into a summary instead of growing the chat_history
+        passed to every LLM call.
+
+        Args:
+            session_id: Session identifier
+            num_messages: Number of oldest messages to summarize
+        """
+        try:
+            history = self.session_store.get(session_id)
+            if history is None or len(history.messages) <= num_messages:
+                return
+
+            to_summarize = history.messages[:num_messages]
+            transcript = "\n".join(
+                f"{message.type}: {message.content}" for message in to_summarize
+            )
+            summary = await asyncio.to_thread(
+                self.llm.invoke,
+                "Summarize the following conversation concisely, preserving any "
+                "facts, names, and decisions that later turns may refer back to:\n\n"
+                + transcript
+            )
+            summary_message = SystemMessage(
+                content=f"Summary of earlier conversation: {summary.content}"
+            )
+            history.messages[:num_messages] = [summary_message]
+            logger.info(
+                f"Consolidated {num_messages} messages into a summary "
+                f"for session {session_id}"
+            )
+        except Exception as e:
+            logger.warning(f"Memory consolidation failed for session {session_id}: {e}")
+        finally:
+            self._active_consolidations.discard(session_id)
+
     def clear_history(self, session_id: str) -> None:
         """
         Clear chat history for a session
@@ -152,8 +417,9 @@ class ChatService:
             session_id: Session identifier
         """
         if session_id in self.session_store:
-            self.session_store[session_id] = ChatMessageHistory()
+            self.session_store.put(session_id, ChatMessageHistory())
             logger.info(f"Cleared chat history for session {session_id}")
+        self.semantic_cache.invalidate(session_id)
     
     def delete_session(self, session_id: str) -> None:
         """
@@ -162,9 +428,9 @@ class ChatService:
         Args:
             session_id: Session identifier
         """
-        if session_id in self.session_store:
-            del self.session_store[session_id]
+        if self.session_store.pop(session_id) is not None:
             logger.info(f"Deleted session {session_id} from chat service")
+        self.semantic_cache.invalidate(session_id)
     
     def get_message_count(self, session_id: str) -> int:
         """
@@ -176,9 +442,10 @@ class ChatService:
         Returns:
             int: Number of messages
         """
-        if session_id not in self.session_store:
+        history = self.session_store.get(session_id)
+        if history is None:
             return 0
-        return len(self.session_store[session_id].messages)
+        return len(history.messages)
     
     def session_exists(self, session_id: str) -> bool:
         """
@@ -193,5 +460,15 @@ class ChatService:
         return session_id in self.session_store
 
 
-# Global instance
-chat_service = ChatService()
+@lru_cache(maxsize=1)
+def get_chat_service() -> ChatService:
+    """
+    Get the per-process ChatService singleton
+
+    Lazily constructed so importing the module does not require a Groq
+    API key or build the LLM client.
+
+    Returns:
+        ChatService: The shared service instance
+    """
+    return ChatService()
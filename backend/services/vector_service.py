@@ -1,32 +1,154 @@
 """
 Vector store service for PDF processing and retrieval
 """
+import asyncio
+import hashlib
+import pickle
+import threading
+import time
+from functools import lru_cache
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 import logging
 
+import faiss
+import numpy as np
+from pypdf import PdfReader
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain_community.vectorstores import FAISS
-from langchain_community.document_loaders import PyPDFLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_community.embeddings import OllamaEmbeddings
 from langchain.schema import Document
 
 from backend.config import settings
+from backend.utils.cache import BoundedSessionCache
 
 logger = logging.getLogger(__name__)
 
+def _count_pages(pdf_path: str) -> int:
+    """
+    Count the pages of a PDF (runs off the event loop)
+
+    Args:
+        pdf_path: Path to PDF file
+
+    Returns:
+        int: Number of pages
+    """
+    return len(PdfReader(pdf_path).pages)
+
+
+def _extract_page_text(pdf_path: str, page_index: int) -> str:
+    """
+    Extract text from a single PDF page (runs in a worker process)
+
+    Args:
+        pdf_path: Path to PDF file
+        page_index: Zero-based page index
+
+    Returns:
+        str: Extracted page text
+    """
+    reader = PdfReader(pdf_path)
+    return reader.pages[page_index].extract_text() or ""
+
+
+# Query-embedding cache shared across all embedding instances; the
+# lock guards it against concurrent to_thread callers
+_embed_query_cache: OrderedDict = OrderedDict()
+_embed_cache_stats = {"hits": 0, "misses": 0}
+_embed_cache_lock = threading.Lock()
+
+
+class CachedOllamaEmbeddings(OllamaEmbeddings):
+    """OllamaEmbeddings with an LRU+TTL cache around embed_query
+
+    Identical prompts are embedded once; repeat queries skip the Ollama
+    HTTP round-trip entirely. Keys are SHA-256 digests of the text.
+    """
+
+    def embed_query(self, text: str) -> List[float]:
+        """
+        Embed a query, serving repeats from the cache
+
+        Args:
+            text: Text to embed
+
+        Returns:
+            List[float]: Embedding vector
+        """
+        key = hashlib.sha256(text.encode()).hexdigest()
+        now = time.time()
+
+        with _embed_cache_lock:
+            entry = _embed_query_cache.get(key)
+            if entry is not None and now - entry[0] <= settings.EMBED_CACHE_TTL_SECONDS:
+                _embed_query_cache.move_to_end(key)
+                _embed_cache_stats["hits"] += 1
+                return entry[1]
+            _embed_cache_stats["misses"] += 1
+
+        # The Ollama round-trip happens outside the lock
+        embedding = super().embed_query(text)
+
+        with _embed_cache_lock:
+            _embed_query_cache[key] = (now, embedding)
+            _embed_query_cache.move_to_end(key)
+            while len(_embed_query_cache) > settings.EMBED_CACHE_SIZE:
+                _embed_query_cache.popitem(last=False)
+
+        return embedding
+
+    @staticmethod
+    def get_stats() -> dict:
+        """
+        Get embedding cache statistics
+
+        Returns:
+            dict: Hit/miss counts and hit rate
+        """
+        with _embed_cache_lock:
+            hits = _embed_cache_stats["hits"]
+            misses = _embed_cache_stats["misses"]
+            size = len(_embed_query_cache)
+        total = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / total if total else 0.0,
+            "size": size,
+        }
+
 
 class VectorStoreService:
     """Service for managing vector stores"""
     
     def __init__(self):
         """Initialize the vector store service"""
-        self.embeddings = OllamaEmbeddings(
+        self.embeddings = CachedOllamaEmbeddings(
             model=settings.EMBEDDING_MODEL,
             base_url=settings.OLLAMA_BASE_URL
         )
-        self.vectorstore_cache: Dict[str, FAISS] = {}
+        self.vectorstore_cache = BoundedSessionCache(
+            max_entries=settings.MAX_CACHED_SESSIONS,
+            ttl_seconds=settings.SESSION_TTL_HOURS * 3600,
+            max_memory_bytes=settings.MAX_CACHE_MEMORY_MB * 1024 * 1024,
+            sizeof=self._estimate_index_memory
+        )
         self.session_metadata: Dict[str, dict] = {}
+        # Shared page-extraction pool, forked once on first parallel
+        # load instead of per upload
+        self._pdf_executor: Optional[ProcessPoolExecutor] = None
+        # Registry of known sessions, seeded from disk once at startup
+        self.session_registry: Dict[str, dict] = {}
+        if settings.VECTORS_DIR.exists():
+            for session_dir in settings.VECTORS_DIR.iterdir():
+                if session_dir.is_dir():
+                    self.session_registry[session_dir.name] = {
+                        "last_accessed": time.time()
+                    }
         
         logger.info(f"VectorStoreService initialized with model: {settings.EMBEDDING_MODEL}")
     
@@ -47,9 +169,8 @@ class VectorStoreService:
         try:
             # Load PDF
             logger.info(f"Loading PDF: {pdf_path}")
-            loader = PyPDFLoader(pdf_path)
-            documents = loader.load()
-            
+            documents = await self._load_pdf(pdf_path)
+
             if not documents:
                 raise ValueError("PDF contains no readable text")
             
@@ -63,28 +184,29 @@ class VectorStoreService:
                 length_function=len,
                 separators=["\n\n", "\n", " ", ""]
             )
-            splits = text_splitter.split_documents(documents)
+            splits = await asyncio.to_thread(text_splitter.split_documents, documents)
             num_chunks = len(splits)
             
             logger.info(f"Split into {num_chunks} chunks")
             
             # Create vectorstore with embeddings
             logger.info("Creating embeddings...")
-            vectorstore = FAISS.from_documents(splits, self.embeddings)
+            vectorstore = await asyncio.to_thread(self._build_vectorstore, splits)
             
             # Save to disk
             vectorstore_path = settings.VECTORS_DIR / session_id
             vectorstore_path.mkdir(exist_ok=True)
-            vectorstore.save_local(str(vectorstore_path))
+            await asyncio.to_thread(vectorstore.save_local, str(vectorstore_path))
             
             # Cache in memory
-            self.vectorstore_cache[session_id] = vectorstore
+            self.vectorstore_cache.put(session_id, vectorstore)
             
             # Store metadata
             self.session_metadata[session_id] = {
                 "pages": num_pages,
                 "chunks": num_chunks
             }
+            self._touch_session(session_id)
             
             logger.info(f"Successfully processed PDF for session {session_id}")
             
@@ -94,7 +216,162 @@ class VectorStoreService:
             logger.error(f"Failed to process PDF: {str(e)}")
             raise Exception(f"PDF processing failed: {str(e)}")
     
-    def get_vectorstore(self, session_id: str) -> FAISS:
+    async def _load_pdf(self, pdf_path: str) -> List[Document]:
+        """
+        Load a PDF into per-page documents, parsing pages in parallel
+
+        Pages are parsed with pypdf directly rather than through the
+        PyPDFLoader wrapper. Text extraction is CPU-bound, so pages are
+        fanned out to a process pool when PDF_PARALLEL_WORKERS allows
+        it; single-worker configs extract sequentially off the event
+        loop thread.
+
+        Args:
+            pdf_path: Path to PDF file
+
+        Returns:
+            List[Document]: One document per non-empty page
+        """
+        workers = settings.PDF_PARALLEL_WORKERS
+        # Even the xref parse for a page count can block on large PDFs,
+        # so it runs off the event loop too
+        num_pages = await asyncio.to_thread(_count_pages, pdf_path)
+
+        if workers <= 1 or num_pages <= 1:
+            def _extract_all() -> List[str]:
+                reader = PdfReader(pdf_path)
+                return [page.extract_text() or "" for page in reader.pages]
+
+            pages_text = await asyncio.to_thread(_extract_all)
+        else:
+            loop = asyncio.get_running_loop()
+            executor = self._get_pdf_executor()
+            futures = [
+                loop.run_in_executor(executor, _extract_page_text, pdf_path, i)
+                for i in range(num_pages)
+            ]
+            pages_text = await asyncio.gather(*futures)
+
+        return [
+            Document(page_content=text, metadata={"page": i, "source": pdf_path})
+            for i, text in enumerate(pages_text)
+            if text.strip()
+        ]
+
+    def _get_pdf_executor(self) -> ProcessPoolExecutor:
+        """
+        Get the shared page-extraction process pool, creating it once
+
+        Returns:
+            ProcessPoolExecutor: Pool sized to PDF_PARALLEL_WORKERS
+        """
+        if self._pdf_executor is None:
+            self._pdf_executor = ProcessPoolExecutor(
+                max_workers=settings.PDF_PARALLEL_WORKERS
+            )
+        return self._pdf_executor
+
+    def _embed_texts(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed chunk texts in batches with bounded concurrency
+
+        Args:
+            texts: Chunk texts to embed
+
+        Returns:
+            List[List[float]]: Embedding vectors, in input order
+        """
+        batch_size = settings.EMBED_BATCH_SIZE
+        batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+
+        if len(batches) == 1 or settings.EMBED_CONCURRENCY <= 1:
+            vectors = []
+            for batch in batches:
+                vectors.extend(self.embeddings.embed_documents(batch))
+            return vectors
+
+        with ThreadPoolExecutor(max_workers=settings.EMBED_CONCURRENCY) as executor:
+            results = list(executor.map(self.embeddings.embed_documents, batches))
+        return [vector for batch in results for vector in batch]
+
+    def _build_vectorstore(self, splits: List[Document]) -> FAISS:
+        """
+        Build a FAISS vectorstore from document chunks
+
+        Args:
+            splits: Chunked documents
+
+        Returns:
+            FAISS: Vector store over the chunks
+        """
+        texts = [doc.page_content for doc in splits]
+        metadatas = [doc.metadata for doc in splits]
+        vectors = self._embed_texts(texts)
+
+        if settings.INDEX_TYPE == "flat":
+            return FAISS.from_embeddings(
+                list(zip(texts, vectors)),
+                self.embeddings,
+                metadatas=metadatas
+            )
+
+        # Build a sub-linear index and wrap it for LangChain
+        xb = np.asarray(vectors, dtype=np.float32)
+        index = self._build_index(xb)
+        vectorstore = FAISS(
+            embedding_function=self.embeddings,
+            index=index,
+            docstore=InMemoryDocstore(),
+            index_to_docstore_id={}
+        )
+        vectorstore.add_embeddings(list(zip(texts, vectors)), metadatas=metadatas)
+        return vectorstore
+
+    def _build_index(self, xb: np.ndarray) -> "faiss.Index":
+        """
+        Build an empty, trained FAISS index per settings.INDEX_TYPE
+
+        HNSW gives sub-linear search for corpora up to ~1M vectors;
+        IVF-PQ trades some recall for compressed storage on larger ones.
+        Falls back to a flat index when the corpus is too small to
+        benefit.
+
+        Args:
+            xb: Stacked float32 embedding matrix, shape (n, d)
+
+        Returns:
+            faiss.Index: Index ready for vectors to be added
+        """
+        n, d = xb.shape
+        index_type = settings.INDEX_TYPE
+
+        if index_type == "hnsw" and n > 1:
+            index = faiss.IndexHNSWFlat(d, 32)
+            index.hnsw.efConstruction = 200
+            index.hnsw.efSearch = 64
+            return index
+
+        if index_type == "sq8" and n > 1:
+            # int8 scalar quantization: 4x smaller than float32 storage
+            index = faiss.IndexScalarQuantizer(d, faiss.ScalarQuantizer.QT_8bit)
+            index.train(xb)
+            return index
+
+        if index_type == "ivfpq" and n >= 256:
+            # Product quantization: 32 bytes/vector vs d*4 for float32
+            nlist = min(256, max(1, n // 39))
+            quantizer = faiss.IndexFlatL2(d)
+            index = faiss.IndexIVFPQ(quantizer, d, nlist, 32, 8)
+            index.train(xb)
+            index.nprobe = settings.IVF_NPROBE
+            return index
+
+        if index_type not in ("flat", "hnsw", "sq8", "ivfpq"):
+            logger.warning(f"Unknown INDEX_TYPE '{index_type}', using flat index")
+
+        return faiss.IndexFlatL2(d)
+
+    async def get_vectorstore(self, session_id: str) -> FAISS:
         """
         Get or load vectorstore for a session
         
@@ -108,9 +385,10 @@ class VectorStoreService:
             ValueError: If vectorstore not found
         """
         # Check cache first
-        if session_id in self.vectorstore_cache:
+        cached = self.vectorstore_cache.get(session_id)
+        if cached is not None:
             logger.info(f"Retrieved vectorstore from cache for session {session_id}")
-            return self.vectorstore_cache[session_id]
+            return cached
         
         # Try loading from disk
         vectorstore_path = settings.VECTORS_DIR / session_id
@@ -120,14 +398,11 @@ class VectorStoreService:
         
         try:
             logger.info(f"Loading vectorstore from disk for session {session_id}")
-            vectorstore = FAISS.load_local(
-                str(vectorstore_path),
-                self.embeddings,
-                allow_dangerous_deserialization=True
-            )
+            vectorstore = await self._load_local(vectorstore_path)
             
             # Cache for future use
-            self.vectorstore_cache[session_id] = vectorstore
+            self.vectorstore_cache.put(session_id, vectorstore)
+            self._touch_session(session_id)
             
             return vectorstore
             
@@ -135,6 +410,92 @@ class VectorStoreService:
             logger.error(f"Failed to load vectorstore: {str(e)}")
             raise ValueError(f"Failed to load vectorstore: {str(e)}")
     
+    async def batch_search(self, session_id: str, queries: List[str],
+                           k: int = None) -> List[Document]:
+        """
+        Search several query variants in one FAISS call and fuse results
+
+        All query embeddings are stacked into a single index.search
+        call; per-query rankings are fused with reciprocal rank fusion
+        (1 / (60 + rank)).
+
+        Args:
+            session_id: Session identifier
+            queries: Query variants to search
+            k: Number of documents to return (defaults to RETRIEVAL_K)
+
+        Returns:
+            List[Document]: Fused top-k documents
+
+        Raises:
+            ValueError: If no vectorstore exists for the session
+        """
+        k = k or settings.RETRIEVAL_K
+        vectorstore = await self.get_vectorstore(session_id)
+
+        embeddings = await asyncio.to_thread(
+            lambda: [self.embeddings.embed_query(query) for query in queries]
+        )
+        xq = np.asarray(embeddings, dtype=np.float32)
+        _, indices = await asyncio.to_thread(vectorstore.index.search, xq, k)
+
+        # Reciprocal rank fusion across the query variants
+        scores: Dict[int, float] = {}
+        for row in indices:
+            for rank, idx in enumerate(row):
+                if idx == -1:
+                    continue
+                scores[idx] = scores.get(idx, 0.0) + 1.0 / (60 + rank)
+
+        fused = sorted(scores, key=scores.get, reverse=True)[:k]
+        return [
+            vectorstore.docstore.search(vectorstore.index_to_docstore_id[idx])
+            for idx in fused
+        ]
+
+    async def _load_local(self, vectorstore_path: Path) -> FAISS:
+        """
+        Load a saved vectorstore, memory-mapping the index when enabled
+
+        With FAISS_MMAP the raw index is opened read-only via mmap, so
+        the OS pages vectors in on demand instead of reading the whole
+        file into RAM up front. Falls back to the standard loader for
+        index types that cannot be mapped.
+
+        Args:
+            vectorstore_path: Directory containing index.faiss/index.pkl
+
+        Returns:
+            FAISS: Loaded vector store
+        """
+        if settings.FAISS_MMAP:
+            try:
+                return await asyncio.to_thread(self._load_local_mmap, vectorstore_path)
+            except Exception as e:
+                logger.warning(f"mmap load failed, using standard load: {e}")
+
+        return await asyncio.to_thread(
+            FAISS.load_local,
+            str(vectorstore_path),
+            self.embeddings,
+            allow_dangerous_deserialization=True
+        )
+
+    def _load_local_mmap(self, vectorstore_path: Path) -> FAISS:
+        """Reconstruct the FAISS wrapper around a memory-mapped index"""
+        index = faiss.read_index(
+            str(vectorstore_path / "index.faiss"),
+            faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+        )
+        with open(vectorstore_path / "index.pkl", "rb") as f:
+            docstore, index_to_docstore_id = pickle.load(f)
+        return FAISS(
+            embedding_function=self.embeddings,
+            index=index,
+            docstore=docstore,
+            index_to_docstore_id=index_to_docstore_id
+        )
+
     def has_vectorstore(self, session_id: str) -> bool:
         """
         Check if vectorstore exists for session
@@ -145,7 +506,8 @@ class VectorStoreService:
         Returns:
             bool: True if exists, False otherwise
         """
-        return (session_id in self.vectorstore_cache or 
+        return (session_id in self.vectorstore_cache or
+                session_id in self.session_registry or
                 (settings.VECTORS_DIR / session_id).exists())
     
     def delete_vectorstore(self, session_id: str) -> None:
@@ -156,8 +518,8 @@ class VectorStoreService:
             session_id: Session identifier
         """
         # Remove from cache
-        if session_id in self.vectorstore_cache:
-            del self.vectorstore_cache[session_id]
+        self.vectorstore_cache.pop(session_id)
+        self.session_registry.pop(session_id, None)
         
         if session_id in self.session_metadata:
             del self.session_metadata[session_id]
@@ -169,6 +531,19 @@ class VectorStoreService:
             shutil.rmtree(vectorstore_path)
             logger.info(f"Deleted vectorstore for session {session_id}")
     
+    def _touch_session(self, session_id: str) -> None:
+        """Record a session in the registry and refresh its access time"""
+        self.session_registry[session_id] = {"last_accessed": time.time()}
+
+    def list_session_ids(self) -> List[str]:
+        """
+        List all known session IDs without touching the filesystem
+
+        Returns:
+            List[str]: Registered session identifiers
+        """
+        return list(self.session_registry.keys())
+
     def get_metadata(self, session_id: str) -> dict:
         """
         Get metadata for a session
@@ -190,6 +565,42 @@ class VectorStoreService:
         """
         return len(self.vectorstore_cache)
 
+    @staticmethod
+    def _estimate_index_memory(vectorstore: FAISS) -> int:
+        """
+        Estimate FAISS index memory from per-vector storage cost
+
+        Quantized indexes store compressed codes rather than raw
+        float32 vectors, so the estimate respects the index type.
+
+        Args:
+            vectorstore: Cached vector store
+
+        Returns:
+            int: Estimated memory in bytes
+        """
+        try:
+            index = vectorstore.index
+            if isinstance(index, faiss.IndexIVFPQ):
+                bytes_per_vector = index.pq.code_size
+            elif isinstance(index, faiss.IndexScalarQuantizer):
+                bytes_per_vector = index.code_size
+            else:
+                bytes_per_vector = index.d * 4
+            return index.ntotal * bytes_per_vector
+        except AttributeError:
+            return 0
+
+
+@lru_cache(maxsize=1)
+def get_vector_service() -> VectorStoreService:
+    """
+    Get the per-process VectorStoreService singleton
+
+    Lazily constructed so importing the module (e.g. under pytest or
+    compile checks) does not build the Ollama client.
 
-# Global instance
-vector_service = VectorStoreService()
+    Returns:
+        VectorStoreService: The shared service instance
+    """
+    return VectorStoreService()
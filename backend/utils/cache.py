@@ -0,0 +1,130 @@
+"""
+Bounded LRU cache with TTL for per-session state
+"""
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class BoundedSessionCache:
+    """LRU cache with TTL and memory-pressure eviction
+
+    Keeps per-session state (FAISS indexes, chat histories) from growing
+    without bound on long-running servers. Entries are evicted least-
+    recently-used first once the entry count or estimated memory budget
+    is exceeded, and expire after a TTL.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float,
+                 max_memory_bytes: Optional[int] = None,
+                 sizeof: Optional[Callable[[Any], int]] = None):
+        """
+        Initialize the cache
+
+        Args:
+            max_entries: Maximum number of cached entries
+            ttl_seconds: Time-to-live for entries in seconds
+            max_memory_bytes: Optional memory budget across all entries
+            sizeof: Optional callable estimating an entry's memory in bytes
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_memory_bytes = max_memory_bytes
+        self.sizeof = sizeof
+        self._entries: OrderedDict[str, Any] = OrderedDict()
+        self._timestamps: Dict[str, float] = {}
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Get an entry, refreshing its LRU position
+
+        Args:
+            key: Cache key
+
+        Returns:
+            Optional[Any]: Cached value, or None if missing or expired
+        """
+        if key not in self._entries:
+            return None
+        if time.time() - self._timestamps[key] > self.ttl_seconds:
+            self.pop(key)
+            return None
+        self._entries.move_to_end(key)
+        self._timestamps[key] = time.time()
+        return self._entries[key]
+
+    def put(self, key: str, value: Any) -> None:
+        """
+        Insert or replace an entry, evicting LRU entries as needed
+
+        Args:
+            key: Cache key
+            value: Value to cache
+        """
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        self._timestamps[key] = time.time()
+
+        while len(self._entries) > self.max_entries:
+            self._evict_oldest()
+
+        if self.max_memory_bytes is not None and self.sizeof is not None:
+            while len(self._entries) > 1 and self._estimated_memory() > self.max_memory_bytes:
+                self._evict_oldest()
+
+    def pop(self, key: str) -> Optional[Any]:
+        """
+        Remove and return an entry
+
+        Args:
+            key: Cache key
+
+        Returns:
+            Optional[Any]: Removed value, or None if absent
+        """
+        self._timestamps.pop(key, None)
+        return self._entries.pop(key, None)
+
+    def sweep(self) -> int:
+        """
+        Remove all expired entries
+
+        Returns:
+            int: Number of entries removed
+        """
+        now = time.time()
+        expired = [key for key, ts in self._timestamps.items()
+                   if now - ts > self.ttl_seconds]
+        for key in expired:
+            self.pop(key)
+        if expired:
+            logger.info(f"Swept {len(expired)} expired cache entries")
+        return len(expired)
+
+    def keys(self) -> List[str]:
+        """
+        Get all cached keys
+
+        Returns:
+            List[str]: Cache keys in LRU order
+        """
+        return list(self._entries.keys())
+
+    def _evict_oldest(self) -> None:
+        """Evict the least recently used entry"""
+        key, _ = self._entries.popitem(last=False)
+        self._timestamps.pop(key, None)
+        logger.info(f"Evicted cache entry for session {key}")
+
+    def _estimated_memory(self) -> int:
+        """Estimate total memory held by cached entries in bytes"""
+        return sum(self.sizeof(value) for value in self._entries.values())
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -1,29 +1,81 @@
 """
 Utility helper functions for the application
 """
+import atexit
+import base64
+import functools
 import os
-import uuid
+import queue
+import re
+import secrets
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional
-from fastapi import UploadFile, HTTPException
+from typing import BinaryIO, Optional
+from fastapi import Request, UploadFile, HTTPException
+from fastapi.concurrency import run_in_threadpool
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Recognized session ID prefixes, matched by the compiled DFA in one
+# C call; anything after the prefix is accepted, as before
+_SESSION_RE = re.compile(r"^(?:session_|portfolio_)")
 
+# Size units indexed by power-of-1024 magnitude
+_UNITS = ('B', 'KB', 'MB', 'GB', 'TB')
+
+# Small dedicated pool so temp-file deletion never blocks the request
+# path; created lazily since the upload route recycles scratch files
+# through TempFilePool and may never delete anything
+_cleanup_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _get_cleanup_executor() -> ThreadPoolExecutor:
+    """Create the cleanup executor on first use"""
+    global _cleanup_executor
+    if _cleanup_executor is None:
+        _cleanup_executor = ThreadPoolExecutor(
+            max_workers=2, thread_name_prefix="tmp-cleanup"
+        )
+        # Drained at interpreter exit so queued deletes still run
+        atexit.register(_cleanup_executor.shutdown, wait=True)
+    return _cleanup_executor
+
+
+@functools.lru_cache(maxsize=4096)
 def validate_session_id(session_id: str) -> bool:
     """
     Validate session ID format
     
+    Pure function over short strings, so results are memoized; the
+    LRU bound keeps the cache from growing with hostile input.
+    
     Args:
         session_id: Session identifier to validate
         
     Returns:
         bool: True if valid, False otherwise
     """
-    if not session_id or len(session_id) < 5:
-        return False
-    return session_id.startswith("session_") or session_id.startswith("portfolio_")
+    return bool(_SESSION_RE.match(session_id)) if session_id else False
+
+
+def validate_session_ids_batch(session_ids) -> list:
+    """
+    Validate many session IDs in one pass
+    
+    Skips the per-call memoization layer; the compiled pattern stays
+    hot across the whole batch.
+    
+    Args:
+        session_ids: Iterable of session identifiers
+        
+    Returns:
+        list: Validity flag per input, in order
+    """
+    match = _SESSION_RE.match
+    return [bool(s) and bool(match(s)) for s in session_ids]
 
 
 def generate_session_id() -> str:
@@ -33,100 +85,336 @@ def generate_session_id() -> str:
     Returns:
         str: Unique session identifier
     """
-    return f"session_{uuid.uuid4().hex[:12]}"
+    # base32 packs 5 bits per character, so 64 bits of OS entropy fit
+    # in 13 chars with no UUID object construction
+    token = base64.b32encode(os.urandom(8)).rstrip(b'=').decode('ascii').lower()
+    return f"session_{token}"
+
+
+class TempFilePool:
+    """
+    Bounded pool of reusable scratch file paths
+    
+    Uploads write into a recycled path instead of creating and
+    unlinking a fresh directory entry per request; release() truncates
+    the file and returns its path to the pool.
+    """
+
+    def __init__(self, directory: Path, pool_size: int = 8):
+        self._directory = Path(directory)
+        self._directory.mkdir(exist_ok=True)
+        # Scratch names carry the pid so multi-worker deployments
+        # sharing the upload dir never hand two processes the same path
+        self._prefix = f"scratch_{os.getpid()}"
+        self._paths: queue.Queue = queue.Queue()
+        for i in range(pool_size):
+            path = self._directory / f"{self._prefix}_{i:02d}.pdf"
+            path.touch(exist_ok=True)
+            self._paths.put(path)
+
+    def acquire(self) -> Path:
+        """
+        Take a scratch path from the pool, creating one if exhausted
+        
+        Returns:
+            Path: Writable scratch file path
+        """
+        try:
+            return self._paths.get_nowait()
+        except queue.Empty:
+            path = self._directory / f"{self._prefix}_{secrets.token_hex(4)}.pdf"
+            path.touch(exist_ok=True)
+            return path
+
+    def release(self, path: Path) -> None:
+        """
+        Truncate a scratch file and return its path to the pool
+        
+        Args:
+            path: Path previously returned by acquire()
+        """
+        try:
+            os.truncate(path, 0)
+            self._paths.put(path)
+        except OSError as e:
+            logger.warning("Could not recycle scratch file %s: %s", path, e)
+
+
+def _unlink_with_retry(file_path: str, attempts: int = 3) -> None:
+    """
+    Delete a file, retrying transient errors with exponential backoff
+    
+    Args:
+        file_path: Path to file to delete
+        attempts: Maximum number of unlink attempts
+    """
+    for attempt in range(attempts):
+        # EAFP: a lone unlink avoids the exists/remove race and an
+        # extra stat syscall
+        try:
+            os.unlink(file_path)
+            logger.info("Cleaned up temp file: %s", file_path)
+            return
+        except FileNotFoundError:
+            return
+        except OSError as e:
+            if attempt == attempts - 1:
+                logger.warning("Could not delete temp file %s: %s", file_path, e)
+                return
+            time.sleep(2 ** attempt)
 
 
 def cleanup_temp_file(file_path: str) -> None:
     """
-    Safely delete temporary file
+    Safely delete temporary file without blocking the caller
+    
+    The unlink runs on a background worker so responses are not held
+    up by disk latency; transient failures (e.g. EBUSY on network
+    filesystems) are retried.
     
     Args:
         file_path: Path to file to delete
     """
     try:
-        if os.path.exists(file_path):
-            os.remove(file_path)
-            logger.info(f"Cleaned up temp file: {file_path}")
-    except Exception as e:
-        logger.warning(f"Could not delete temp file {file_path}: {e}")
+        _get_cleanup_executor().submit(_unlink_with_retry, file_path)
+    except RuntimeError:
+        # Executor already shut down (interpreter exit): delete inline
+        _unlink_with_retry(file_path)
+
+
+@functools.lru_cache(maxsize=8)
+def _size_limit_detail(max_size: int) -> str:
+    """Build the oversize-upload error detail once per limit"""
+    return f"File size exceeds maximum allowed size of {max_size / 1048576:.1f}MB"
 
 
-async def validate_pdf_upload(file: UploadFile, max_size: int = 10 * 1024 * 1024) -> None:
+def _inmemory_payload(file_obj) -> Optional[memoryview]:
     """
-    Validate uploaded PDF file
+    Return an unrolled spool's in-memory buffer without copying
     
     Args:
-        file: Uploaded file
-        max_size: Maximum file size in bytes (default 10MB)
+        file_obj: Candidate SpooledTemporaryFile
         
-    Raises:
-        HTTPException: If validation fails
+    Returns:
+        memoryview of the buffered bytes, or None if the spool has
+        rolled over to disk (or is not a spooled file)
     """
-    # Check file extension
-    if not file.filename.lower().endswith('.pdf'):
-        raise HTTPException(
-            status_code=400,
-            detail="Only PDF files are allowed"
-        )
-    
-    # Check file size
-    file.file.seek(0, 2)  # Seek to end
-    file_size = file.file.tell()
-    file.file.seek(0)  # Reset to beginning
-    
-    if file_size > max_size:
-        raise HTTPException(
-            status_code=400,
-            detail=f"File size exceeds maximum allowed size of {max_size / (1024*1024):.1f}MB"
-        )
-    
-    if file_size == 0:
-        raise HTTPException(
-            status_code=400,
-            detail="Uploaded file is empty"
-        )
+    if getattr(file_obj, "_rolled", None) is False:
+        inner = getattr(file_obj, "_file", None)
+        if hasattr(inner, "getbuffer"):
+            return inner.getbuffer()
+    return None
 
 
-async def save_upload_file(upload_file: UploadFile, destination: Path) -> Path:
+def _copy_upload(source, buffer, file_size: Optional[int]) -> None:
     """
-    Save uploaded file to destination
+    Copy an upload's file object to an open destination file
+
+    Once a SpooledTemporaryFile has rolled over to disk both ends are
+    real file descriptors, so os.sendfile can copy in-kernel with zero
+    user-space copies. In-memory spools (and platforms without
+    sendfile) fall back to chunked copyfileobj.
+
+    Args:
+        source: Source file-like object, positioned at the start
+        buffer: Open binary destination file
+        file_size: Size of the source in bytes, if known
+    """
+    if file_size and getattr(source, "_rolled", False):
+        out_fd = buffer.fileno()
+        in_fd = source.fileno()
+        offset = 0
+        try:
+            # sendfile may transfer fewer bytes than asked; keep
+            # advancing the offset until the whole payload is sent
+            while offset < file_size:
+                sent = os.sendfile(out_fd, in_fd, offset, file_size - offset)
+                if sent == 0:
+                    break
+                offset += sent
+            if offset >= file_size:
+                return
+            # Short source: copy whatever remains in userspace
+            source.seek(offset)
+        except OSError:
+            # Restart from scratch with a plain copy
+            buffer.seek(0)
+            buffer.truncate(0)
+            source.seek(0)
+    shutil.copyfileobj(source, buffer, 65536)
+    # Trim any pre-allocated tail left when the source was shorter
+    # than the declared size
+    buffer.truncate()
+
+
+def save_upload_file(file_obj: BinaryIO, destination: "str | os.PathLike",
+                     file_size: Optional[int] = None) -> str:
+    """
+    Save an upload's raw file object to destination
+    
+    Takes the sync file-like directly — the UploadFile wrapper is
+    unwrapped once at the endpoint boundary, so no per-read threadpool
+    dispatch happens here. Blocking on purpose: callers offload the
+    whole save with a single run_in_threadpool call. Works on plain
+    path strings to skip pathlib overhead on the hot path.
     
     Args:
-        upload_file: File to save
+        file_obj: Source file object, positioned at the start
         destination: Destination path
+        file_size: File size from validation, enables the sendfile path
         
     Returns:
-        Path: Path to saved file
+        str: Path to saved file
         
     Raises:
         HTTPException: If save fails
     """
+    destination = os.fspath(destination)
     try:
         with open(destination, "wb") as buffer:
-            content = await upload_file.read()
-            buffer.write(content)
-        logger.info(f"Saved file to: {destination}")
+            if file_size:
+                # Reserve the full extent up front so the kernel does
+                # not grow the file block by block (Linux-only)
+                try:
+                    os.posix_fallocate(buffer.fileno(), 0, file_size)
+                except (AttributeError, OSError):
+                    pass
+            _copy_upload(file_obj, buffer, file_size)
+        logger.info("Saved file to: %s", destination)
         return destination
     except Exception as e:
-        logger.error(f"Failed to save file: {e}")
+        logger.error("Failed to save file: %s", e)
         raise HTTPException(
             status_code=500,
             detail=f"Failed to save uploaded file: {str(e)}"
         )
 
 
+def _stream_with_cap(source, destination: str, max_size: int) -> int:
+    """
+    Stream a file object to destination, stopping past a size cap
+    
+    Args:
+        source: Source file-like object, positioned at the start
+        destination: Destination path string
+        max_size: Maximum number of bytes to accept
+        
+    Returns:
+        int: Bytes written, or max_size + 1 if the cap was exceeded
+        (the destination is truncated back to empty in that case)
+    """
+    written = 0
+    with open(destination, "wb") as buffer:
+        while True:
+            chunk = source.read(65536)
+            if not chunk:
+                return written
+            written += len(chunk)
+            if written > max_size:
+                buffer.truncate(0)
+                return max_size + 1
+            buffer.write(chunk)
+
+
+async def validate_and_save(upload_file: UploadFile,
+                            destination: "str | os.PathLike",
+                            max_size: int = 10 * 1024 * 1024,
+                            request: Optional[Request] = None) -> int:
+    """
+    Validate an uploaded PDF and save it in a single pass
+    
+    Replaces the separate validate-then-save walk over the upload:
+    when the size is known up front the save reuses the sendfile path,
+    otherwise the body is streamed once with a running size cap so an
+    oversize upload is never fully buffered or written.
+    
+    Args:
+        upload_file: File to validate and save
+        destination: Destination path
+        max_size: Maximum file size in bytes (default 10MB)
+        request: Incoming request, enables the Content-Length check
+        
+    Returns:
+        int: Size of the saved file in bytes
+        
+    Raises:
+        HTTPException: If validation or the save fails
+    """
+    # Lowering only the 4-char suffix keeps the check allocation-cheap
+    # while accepting every case variant, like the original .lower()
+    filename = upload_file.filename
+    if not filename or filename[-4:].lower() != '.pdf':
+        raise HTTPException(
+            status_code=400,
+            detail="Only PDF files are allowed"
+        )
+    
+    # Reject clearly oversize requests from the header alone
+    if request is not None:
+        content_length = request.headers.get("content-length")
+        if content_length and int(content_length) > max_size * 1.05:
+            raise HTTPException(
+                status_code=413,
+                detail=_size_limit_detail(max_size)
+            )
+    
+    # Small uploads never leave the multipart parser's memory spool;
+    # their bytes can be written with one sync call, no threadpool hop
+    payload = _inmemory_payload(upload_file.file)
+    file_size = upload_file.size
+    if file_size is None and payload is not None:
+        file_size = payload.nbytes
+    
+    if file_size is not None:
+        if file_size > max_size:
+            raise HTTPException(
+                status_code=413,
+                detail=_size_limit_detail(max_size)
+            )
+        if file_size == 0:
+            raise HTTPException(
+                status_code=400,
+                detail="Uploaded file is empty"
+            )
+        if payload is not None:
+            with open(os.fspath(destination), "wb") as buffer:
+                buffer.write(payload)
+        else:
+            await run_in_threadpool(save_upload_file, upload_file.file, destination, file_size)
+        return file_size
+    
+    # Unknown size: stream once with a running cap
+    written = await run_in_threadpool(
+        _stream_with_cap, upload_file.file, os.fspath(destination), max_size
+    )
+    if written > max_size:
+        raise HTTPException(
+            status_code=413,
+            detail=_size_limit_detail(max_size)
+        )
+    if written == 0:
+        raise HTTPException(
+            status_code=400,
+            detail="Uploaded file is empty"
+        )
+    return written
+
+
+@functools.lru_cache(maxsize=512)
 def format_file_size(size_bytes: int) -> str:
     """
     Format file size in human readable format
     
+    Memoized: the same limit values and rounded sizes recur in logs
+    and responses, so warm calls are a dict lookup.
+    
     Args:
         size_bytes: Size in bytes
         
     Returns:
         str: Formatted size string
     """
-    for unit in ['B', 'KB', 'MB', 'GB']:
-        if size_bytes < 1024.0:
-            return f"{size_bytes:.1f}{unit}"
-        size_bytes /= 1024.0
-    return f"{size_bytes:.1f}TB"
+    # bit_length picks the power-of-1024 unit in O(1) instead of a
+    # divide-and-compare loop
+    idx = min((max(size_bytes, 1).bit_length() - 1) // 10, 4)
+    return f"{size_bytes / (1 << (idx * 10)):.1f}{_UNITS[idx]}"